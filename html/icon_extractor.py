@@ -13,7 +13,7 @@ import numpy as np
 import cv2
 
 def detect_icons(image_path, output_dir, min_size=20, max_size=200, 
-                threshold=0.8, padding=5, method='contour'):
+                threshold=0.8, padding=5, method='contour', fast_gray=False):
     """
     Detect and extract individual icons from an image.
     
@@ -25,6 +25,7 @@ def detect_icons(image_path, output_dir, min_size=20, max_size=200,
         threshold (float): Detection threshold (0-1)
         padding (int): Padding around detected icons
         method (str): Detection method ('contour', 'template', 'grid')
+        fast_gray (bool): Use the green channel as grayscale instead of full luma conversion
     """
     
     # Create output directory
@@ -37,8 +38,12 @@ def detect_icons(image_path, output_dir, min_size=20, max_size=200,
             print(f"Error: Could not load image {image_path}")
             return False
         
-        # Convert to grayscale for processing
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Convert to grayscale for processing; the green channel is a cheap
+        # approximation of luma but can lose saturated red/blue icons
+        if fast_gray:
+            gray = cv2.extractChannel(image, 1)
+        else:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         if method == 'contour':
             icons = detect_by_contours(gray, min_size, max_size, threshold, padding)
@@ -50,22 +55,19 @@ def detect_icons(image_path, output_dir, min_size=20, max_size=200,
             print(f"Unknown method: {method}")
             return False
         
+        # Add padding, clamped to the image bounds
+        boxes = clamp_boxes(icons, image.shape[0], image.shape[1], padding)
+        
         # Extract and save icons
         extracted_count = 0
-        for i, (x, y, w, h) in enumerate(icons):
-            # Add padding
-            x1 = max(0, x - padding)
-            y1 = max(0, y - padding)
-            x2 = min(image.shape[1], x + w + padding)
-            y2 = min(image.shape[0], y + h + padding)
-            
+        for i, ((x, y, w, h), (x1, y1, x2, y2)) in enumerate(zip(icons, boxes)):
             # Extract icon
             icon = image[y1:y2, x1:x2]
             
             # Save icon
             icon_filename = f"icon_{i:03d}.png"
             icon_path = os.path.join(output_dir, icon_filename)
-            cv2.imwrite(icon_path, icon)
+            cv2.imwrite(icon_path, icon, [cv2.IMWRITE_PNG_COMPRESSION, 1])
             
             print(f"Extracted: {icon_filename} ({w}x{h}) at ({x},{y})")
             extracted_count += 1
@@ -77,6 +79,16 @@ def detect_icons(image_path, output_dir, min_size=20, max_size=200,
         print(f"Error processing image: {e}")
         return False
 
+def clamp_boxes(icons, height, width, padding):
+    """Convert (x, y, w, h) boxes to padded (x1, y1, x2, y2) rows clamped to the image."""
+    rects = np.array(icons, dtype=np.int64).reshape(-1, 4)
+    boxes = np.empty_like(rects)
+    boxes[:, 0] = np.maximum(rects[:, 0] - padding, 0)
+    boxes[:, 1] = np.maximum(rects[:, 1] - padding, 0)
+    boxes[:, 2] = np.minimum(rects[:, 0] + rects[:, 2] + padding, width)
+    boxes[:, 3] = np.minimum(rects[:, 1] + rects[:, 3] + padding, height)
+    return boxes
+
 def detect_by_contours(gray, min_size, max_size, threshold, padding):
     """Detect icons using contour detection."""
     # Apply threshold to create binary image
@@ -85,18 +97,21 @@ def detect_by_contours(gray, min_size, max_size, threshold, padding):
     # Find contours
     contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
+    # Get bounding rectangles and filter by size in one vectorized pass
+    rects = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int64).reshape(-1, 4)
+    widths, heights = rects[:, 2], rects[:, 3]
+    size_ok = ((widths >= min_size) & (widths <= max_size) &
+               (heights >= min_size) & (heights <= max_size))
+    
     icons = []
-    for contour in contours:
-        # Get bounding rectangle
-        x, y, w, h = cv2.boundingRect(contour)
+    for i in np.flatnonzero(size_ok):
+        x, y, w, h = (int(v) for v in rects[i])
         
-        # Filter by size
-        if min_size <= w <= max_size and min_size <= h <= max_size:
-            # Calculate contour area ratio to filter out noise
-            area = cv2.contourArea(contour)
-            rect_area = w * h
-            if rect_area > 0 and area / rect_area > threshold:
-                icons.append((x, y, w, h))
+        # Calculate contour area ratio to filter out noise
+        area = cv2.contourArea(contours[i])
+        rect_area = w * h
+        if rect_area > 0 and area / rect_area > threshold:
+            icons.append((x, y, w, h))
     
     return icons
 
@@ -107,18 +122,15 @@ def detect_by_grid(gray, min_size, max_size, padding):
     # Estimate grid size based on image dimensions
     grid_size = min(width, height) // 4  # Assume 4x4 grid
     
-    icons = []
-    for row in range(4):
-        for col in range(4):
-            x = col * grid_size
-            y = row * grid_size
-            w = min(grid_size, width - x)
-            h = min(grid_size, height - y)
-            
-            if w >= min_size and h >= min_size:
-                icons.append((x, y, w, h))
+    # Cell origins in row-major order
+    ys, xs = np.meshgrid(np.arange(4) * grid_size, np.arange(4) * grid_size, indexing='ij')
+    xs, ys = xs.ravel(), ys.ravel()
+    ws = np.minimum(grid_size, width - xs)
+    hs = np.minimum(grid_size, height - ys)
     
-    return icons
+    boxes = np.stack([xs, ys, ws, hs], axis=1)
+    boxes = boxes[(ws >= min_size) & (hs >= min_size)]
+    return [tuple(int(v) for v in box) for box in boxes]
 
 def detect_by_template_matching(gray, min_size, max_size, threshold, padding):
     """Detect icons using template matching (placeholder)."""
@@ -161,6 +173,8 @@ def main():
                        help='Padding around detected icons (default: 5)')
     parser.add_argument('--auto-grid', action='store_true',
                        help='Automatically detect grid size')
+    parser.add_argument('--fast-gray', action='store_true',
+                       help='Use the green channel as grayscale (faster, less accurate for colored icons)')
     
     args = parser.parse_args()
     
@@ -175,7 +189,8 @@ def main():
         args.max_size,
         args.threshold,
         args.padding,
-        args.method
+        args.method,
+        args.fast_gray
     )
     
     if success:
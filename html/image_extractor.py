@@ -6,12 +6,33 @@ Works with PDFs, JPGs, and other image formats.
 
 import os
 import sys
+import math
+import shutil
 import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import repeat
 from pathlib import Path
 from PIL import Image
+import numpy as np
+import cv2
 import fitz  # PyMuPDF for PDFs
+from pdf_image_extractor import (default_workers, chunk_pages, render_chunk,
+                                 extract_page_images, collect_embedded_images,
+                                 batch_image_tasks)
 
-def extract_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=300):
+# OpenCV encodes PNG/JPEG much faster than PIL; other formats still go through PIL
+CV2_SAVE_PARAMS = {
+    'PNG': [cv2.IMWRITE_PNG_COMPRESSION, 1],
+    'JPEG': [cv2.IMWRITE_JPEG_QUALITY, 75],  # PIL's default quality
+    'JPG': [cv2.IMWRITE_JPEG_QUALITY, 75],
+}
+
+# Supported image formats for directory processing
+IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp'})
+
+def extract_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=300,
+                     num_workers=None, png_level=1, grayscale=False):
     """Extract images from PDF file."""
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
@@ -19,47 +40,35 @@ def extract_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=30
         pdf_document = fitz.open(pdf_path)
         
         if method == 'embedded':
+            page_tasks = collect_embedded_images(pdf_document)
+            
             image_count = 0
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]
-                    base_image = pdf_document.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    image_ext = base_image["ext"]
-                    if image_ext == "jpeg":
-                        image_ext = "jpg"
-                    
-                    image_filename = f"page_{page_num:03d}_img_{img_index:03d}.{image_ext}"
-                    image_path = os.path.join(output_dir, image_filename)
-                    
-                    with open(image_path, "wb") as image_file:
-                        image_file.write(image_bytes)
-                    
-                    image_count += 1
-                    print(f"Extracted: {image_filename}")
+            workers = num_workers or default_workers()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filenames in executor.map(extract_page_images, repeat(pdf_path),
+                                              batch_image_tasks(page_tasks, workers),
+                                              repeat(output_dir)):
+                    for image_filename in filenames:
+                        image_count += 1
+                        print(f"Extracted: {image_filename}")
             
             print(f"\nExtracted {image_count} embedded images")
             
         elif method == 'all':
             start_page = page_range[0] if page_range else 0
             end_page = page_range[1] if page_range else len(pdf_document)
+            page_nums = range(start_page, min(end_page, len(pdf_document)))
+            workers = num_workers or default_workers()
             
-            for page_num in range(start_page, min(end_page, len(pdf_document))):
-                page = pdf_document[page_num]
-                mat = fitz.Matrix(dpi/72, dpi/72)
-                pix = page.get_pixmap(matrix=mat)
-                
-                image_filename = f"page_{page_num:03d}.png"
-                image_path = os.path.join(output_dir, image_filename)
-                pix.save(image_path)
-                
-                print(f"Extracted: {image_filename}")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filenames in executor.map(render_chunk, repeat(pdf_path),
+                                              chunk_pages(page_nums, workers), repeat(dpi),
+                                              repeat(output_dir), repeat(png_level),
+                                              repeat(grayscale)):
+                    for image_filename in filenames:
+                        print(f"Extracted: {image_filename}")
             
-            print(f"\nExtracted {end_page - start_page} pages as images")
+            print(f"\nExtracted {len(page_nums)} pages as images")
         
         pdf_document.close()
         return True
@@ -68,13 +77,77 @@ def extract_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=30
         print(f"Error extracting from PDF: {e}")
         return False
 
+def save_image(img, output_path, format='PNG'):
+    """Save a PIL image, using OpenCV's encoder for PNG and JPEG when possible."""
+    params = CV2_SAVE_PARAMS.get(format.upper())
+    if params and img.mode in ('RGB', 'L'):
+        # Wrap PIL's raw buffer directly (one copy) rather than going through
+        # np.asarray's array interface; cvtColor yields a contiguous BGR array
+        arr = np.frombuffer(img.tobytes(), dtype=np.uint8)
+        if img.mode == 'RGB':
+            arr = cv2.cvtColor(arr.reshape(img.height, img.width, 3), cv2.COLOR_RGB2BGR)
+        else:
+            arr = arr.reshape(img.height, img.width)
+        if cv2.imwrite(output_path, arr, params):
+            return
+    
+    img.save(output_path, format=format)
+
+def draft_for_resize(img, resize, crop_box=None):
+    """
+    Let libjpeg decode a JPEG at reduced scale (1/2, 1/4 or 1/8) when it will be
+    downscaled anyway, keeping at least 2x the pixels the resize needs.
+    Returns crop_box mapped onto the drafted image size.
+    """
+    full_w, full_h = img.size
+    left, top, right, bottom = crop_box or (0, 0, full_w, full_h)
+    region_w, region_h = max(right - left, 1), max(bottom - top, 1)
+    
+    if 'x' in resize:
+        target_w, target_h = map(int, resize.split('x'))
+    else:
+        ratio = int(resize) / max(region_w, region_h)
+        target_w, target_h = region_w * ratio, region_h * ratio
+    
+    img.draft('RGB', (max(1, math.ceil(full_w * 2 * target_w / region_w)),
+                      max(1, math.ceil(full_h * 2 * target_h / region_h))))
+    
+    if crop_box is None or img.size == (full_w, full_h):
+        return crop_box
+    scale_x, scale_y = img.size[0] / full_w, img.size[1] / full_h
+    return (round(left * scale_x), round(top * scale_y),
+            round(right * scale_x), round(bottom * scale_y))
+
 def process_image_file(image_path, output_dir, resize=None, crop=None, format='PNG'):
     """Process a single image file (JPG, PNG, etc.)."""
     try:
         # Ensure output directory exists
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         
+        filename = Path(image_path).stem
+        output_path = os.path.join(output_dir, f"{filename}.{format.lower()}")
+        
         with Image.open(image_path) as img:
+            # Nothing would change (same format, no conversion, no resize/crop):
+            # copy the file instead of decoding and re-encoding it
+            target_format = 'JPEG' if format.upper() == 'JPG' else format.upper()
+            if (not resize and not crop and img.format == target_format
+                    and img.mode not in ('RGBA', 'LA', 'P')):
+                if not (os.path.exists(output_path) and os.path.samefile(image_path, output_path)):
+                    shutil.copyfile(image_path, output_path)
+                print(f"Processed: {output_path}")
+                return True
+            
+            crop_box = tuple(map(int, crop.split(','))) if crop else None
+            
+            # Decode downscaled JPEGs at reduced size instead of full resolution
+            if resize and img.format == 'JPEG':
+                crop_box = draft_for_resize(img, resize, crop_box)
+            
+            # Crop first (in source image coordinates) so later steps only touch the kept region
+            if crop_box:
+                img = img.crop(crop_box)
+            
             # Convert to RGB if necessary
             if img.mode in ('RGBA', 'LA', 'P'):
                 img = img.convert('RGB')
@@ -88,15 +161,8 @@ def process_image_file(image_path, output_dir, resize=None, crop=None, format='P
                     size = int(resize)
                     img.thumbnail((size, size), Image.Resampling.LANCZOS)
             
-            # Crop if specified
-            if crop:
-                left, top, right, bottom = map(int, crop.split(','))
-                img = img.crop((left, top, right, bottom))
-            
             # Save processed image
-            filename = Path(image_path).stem
-            output_path = os.path.join(output_dir, f"{filename}.{format.lower()}")
-            img.save(output_path, format=format)
+            save_image(img, output_path, format)
             
             print(f"Processed: {output_path}")
             return True
@@ -105,8 +171,9 @@ def process_image_file(image_path, output_dir, resize=None, crop=None, format='P
         print(f"Error processing {image_path}: {e}")
         return False
 
-def process_image_directory(input_dir, output_dir, resize=None, crop=None, format='PNG'):
-    """Process all images in a directory."""
+def process_image_directory(input_dir, output_dir, resize=None, crop=None, format='PNG',
+                            num_workers=None, executor='process'):
+    """Process all images in a directory, in parallel ('process' or 'thread' executor)."""
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     input_path = Path(input_dir)
@@ -114,14 +181,21 @@ def process_image_directory(input_dir, output_dir, resize=None, crop=None, forma
         print(f"Input directory not found: {input_dir}")
         return False
     
-    # Supported image formats
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+    # Filter while scanning; DirEntry already knows the name and file type
+    paths = []
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            stem, dot, ext = entry.name.rpartition('.')
+            if stem and dot and ext.lower() in IMAGE_EXTENSIONS and entry.is_file():
+                paths.append(entry.path)
     
-    processed_count = 0
-    for img_file in input_path.iterdir():
-        if img_file.suffix.lower() in image_extensions:
-            if process_image_file(img_file, output_dir, resize, crop, format):
-                processed_count += 1
+    # Each file is independent; Pillow releases the GIL while decoding/encoding,
+    # so threads are a lighter option than processes
+    pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+    worker = partial(process_image_file, output_dir=output_dir, resize=resize,
+                     crop=crop, format=format)
+    with pool_class(max_workers=num_workers or os.cpu_count()) as pool:
+        processed_count = sum(pool.map(worker, paths, chunksize=4))
     
     print(f"\nProcessed {processed_count} images")
     return True
@@ -139,6 +213,14 @@ def main():
                        help='Page range to extract (0-indexed, PDF only)')
     parser.add_argument('-d', '--dpi', type=int, default=300,
                        help='DPI for PDF page-to-image conversion (default: 300)')
+    parser.add_argument('-w', '--workers', type=int,
+                       help='Parallel workers (default: min(CPU count, 4) for PDFs, CPU count for directories)')
+    parser.add_argument('--png-level', type=int, choices=range(10), default=1, metavar='0-9',
+                       help='PNG compression level for PDF page images (default: 1, fastest useful)')
+    parser.add_argument('--grayscale', action='store_true',
+                       help='Render PDF pages in grayscale (smaller, e.g. for OCR)')
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process',
+                       help='Executor for directory processing (default: process)')
     parser.add_argument('-r', '--resize', 
                        help='Resize images: size (e.g., 100) or dimensions (e.g., 100x50)')
     parser.add_argument('-c', '--crop', 
@@ -166,12 +248,14 @@ def main():
     success = False
     
     if input_type == 'pdf':
-        success = extract_from_pdf(args.input, args.output, args.method, args.pages, args.dpi)
+        success = extract_from_pdf(args.input, args.output, args.method, args.pages, args.dpi,
+                                   args.workers, args.png_level, args.grayscale)
     elif input_type == 'image':
         if input_path.is_file():
             success = process_image_file(args.input, args.output, args.resize, args.crop, args.format)
         else:
-            success = process_image_directory(args.input, args.output, args.resize, args.crop, args.format)
+            success = process_image_directory(args.input, args.output, args.resize, args.crop, args.format,
+                                              args.workers, args.executor)
     
     if success:
         print(f"\nImages processed to: {args.output}")
@@ -9,25 +9,135 @@ import sys
 import argparse
 import re
 import base64
+import shutil
+import tempfile
+from functools import lru_cache
 from pathlib import Path
-from PIL import Image
-import io
 
+# Common patterns: [icon], {icon}, <icon>, or just icon names
+ICON_PATTERN = re.compile(r'\[([^\]]+)\]|\{([^}]+)\}|<([^>]+)>|(\b\w+_icon\b|\bicon_\w+\b)')
+
+def sniff_image_format(image_data):
+    """Determine image format from its leading magic bytes (defaults to 'png')."""
+    if image_data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if image_data[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if image_data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+        return 'webp'
+    if image_data[:2] == b'BM':
+        return 'bmp'
+    return 'png'
+
+DATA_URI_PREFIXES = {
+    format_name: f"data:image/{format_name};base64,".encode('ascii')
+    for format_name in ('png', 'jpeg', 'gif', 'webp', 'bmp')
+}
+
+# Icons up to this size keep their encoded data URI cached, since the same
+# icon is usually injected many times; larger images are streamed instead
+CACHE_MAX_IMAGE_BYTES = 256 * 1024
+
+@lru_cache(maxsize=256)
 def encode_image_to_base64(image_path):
-    """Convert image to base64 string for inline embedding."""
-    try:
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
-            encoded = base64.b64encode(image_data).decode('utf-8')
-            
-            # Determine image format
-            img = Image.open(image_path)
-            format_name = img.format.lower()
-            
-            return f"data:image/{format_name};base64,{encoded}"
-    except Exception as e:
-        print(f"Error encoding {image_path}: {e}")
-        return None
+    """Convert image to a base64 data URI, as ASCII bytes, for inline embedding (cached per path)."""
+    with open(image_path, "rb") as image_file:
+        image_data = image_file.read()
+    
+    # Determine image format from the bytes already in memory; the URI stays
+    # bytes since the output file is written in binary mode
+    return DATA_URI_PREFIXES[sniff_image_format(image_data)] + base64.b64encode(image_data)
+
+# Multiple of 3 so each chunk encodes to base64 without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+def write_base64_image(out, image_path):
+    """Write an image into binary file out as a base64 data URI; large images are streamed in chunks."""
+    if os.path.getsize(image_path) <= CACHE_MAX_IMAGE_BYTES:
+        out.write(encode_image_to_base64(image_path))
+        return
+    
+    with open(image_path, "rb") as image_file:
+        chunk = image_file.read(BASE64_CHUNK_SIZE)
+        out.write(DATA_URI_PREFIXES[sniff_image_format(chunk)])
+        while chunk:
+            out.write(base64.b64encode(chunk))
+            chunk = image_file.read(BASE64_CHUNK_SIZE)
+
+def write_parts(out, parts):
+    """Write text parts as UTF-8; image paths are written as base64 data URIs."""
+    for part in parts:
+        if isinstance(part, Path):
+            write_base64_image(out, part)
+        else:
+            out.write(part.encode('utf-8'))
+
+def split_icon_references(line, replacements):
+    """
+    Replace [name], {name} and <name> references in a single pass.
+    
+    Returns:
+        list: Line text interleaved with the replacement parts
+    """
+    names = '|'.join(re.escape(name) for name in replacements)
+    pattern = re.compile(rf'\[({names})\]|\{{({names})\}}|<({names})>')
+    parts = []
+    last = 0
+    for match in pattern.finditer(line):
+        parts.append(line[last:match.start()])
+        parts.extend(replacements[match.group(match.lastindex)])
+        last = match.end()
+    parts.append(line[last:])
+    return parts
+
+def build_contains_index(image_names):
+    """
+    Build lookup tables for 'contains' matching.
+    
+    Returns:
+        tuple: (lowercased names, first position of each lowercased name,
+                trigram -> set of positions of names containing it)
+    """
+    lower_names = [name.lower() for name in image_names]
+    name_positions = {}
+    trigram_index = {}
+    for pos, name in enumerate(lower_names):
+        name_positions.setdefault(name, pos)
+        for i in range(len(name) - 2):
+            trigram_index.setdefault(name[i:i + 3], set()).add(pos)
+    return lower_names, name_positions, trigram_index
+
+def find_contains_match(icon_name, contains_index):
+    """
+    Return the position of the first image whose name contains icon_name or is
+    contained in it (case-insensitive), or None. An exact name match wins.
+    """
+    lower_names, name_positions, trigram_index = contains_index
+    icon_lower = icon_name.lower()
+    if icon_lower in name_positions:
+        return name_positions[icon_lower]
+    
+    # Image names that are substrings of the icon name
+    max_len = max(map(len, lower_names), default=0)
+    candidates = set()
+    for i in range(len(icon_lower)):
+        for j in range(i + 1, min(len(icon_lower), i + max_len) + 1):
+            pos = name_positions.get(icon_lower[i:j])
+            if pos is not None:
+                candidates.add(pos)
+    
+    # Image names containing the icon name: intersect trigram postings, then verify
+    if len(icon_lower) >= 3:
+        postings = sorted((trigram_index.get(icon_lower[i:i + 3], set())
+                           for i in range(len(icon_lower) - 2)), key=len)
+        hits = set.intersection(*postings)
+    else:
+        hits = range(len(lower_names))
+    candidates.update(pos for pos in hits if icon_lower in lower_names[pos])
+    
+    return min(candidates) if candidates else None
 
 def inject_images_into_markdown(md_file_path, images_dir, output_file=None, 
                                pattern_type='exact', image_size='small', 
@@ -65,85 +175,102 @@ def inject_images_into_markdown(md_file_path, images_dir, output_file=None,
     
     print(f"Found {len(available_images)} images in {images_dir}")
     
-    # Process content line by line
-    lines = content.split('\n')
-    new_lines = []
+    if pattern_type == 'contains':
+        image_paths = list(available_images.values())
+        contains_index = build_contains_index(available_images.keys())
+        contains_matches = {}
     
-    for line in lines:
-        new_lines.append(line)
-        
-        # Look for potential image injection points
-        # Common patterns: [icon], {icon}, <icon>, or just icon names
-        potential_icons = re.findall(r'\[([^\]]+)\]|\{([^}]+)\}|<([^>]+)>|(\b\w+_icon\b|\bicon_\w+\b)', line)
-        
-        for match in potential_icons:
-            icon_name = next((name for name in match if name), None)
-            if not icon_name:
-                continue
-            
-            # Try to find matching image
-            matching_image = None
-            
-            if pattern_type == 'exact':
-                if icon_name in available_images:
-                    matching_image = available_images[icon_name]
-            
-            elif pattern_type == 'contains':
-                for img_name, img_path in available_images.items():
-                    if icon_name.lower() in img_name.lower() or img_name.lower() in icon_name.lower():
-                        matching_image = img_path
-                        break
-            
-            elif pattern_type == 'regex':
-                for img_name, img_path in available_images.items():
-                    if re.search(icon_name, img_name, re.IGNORECASE):
-                        matching_image = img_path
-                        break
-            
-            if matching_image:
-                # Generate image markdown
-                if encoding == 'base64':
-                    base64_data = encode_image_to_base64(matching_image)
-                    if base64_data:
-                        if position == 'inline':
-                            # Replace the icon reference with inline image
-                            img_markdown = f"![{icon_name}]({base64_data})"
-                            new_lines[-1] = line.replace(f"[{icon_name}]", img_markdown)
-                            new_lines[-1] = new_lines[-1].replace(f"{{{icon_name}}}", img_markdown)
-                            new_lines[-1] = new_lines[-1].replace(f"<{icon_name}>", img_markdown)
-                        else:
-                            # Add image above or below the line
-                            img_markdown = f"![{icon_name}]({base64_data})"
-                            if position == 'above':
-                                new_lines.insert(len(new_lines) - 1, img_markdown)
-                            else:  # below
-                                new_lines.append(img_markdown)
+    # Process content line by line, streaming into a temp file that replaces the
+    # output at the end (the output may be the markdown file itself)
+    output_path = output_file if output_file else md_file_path
+    tmp_path = None
+    try:
+        # Binary mode so base64 payloads are written without decoding to str
+        with tempfile.NamedTemporaryFile('wb', delete=False, suffix='.tmp',
+                                         dir=os.path.dirname(os.path.abspath(output_path)),
+                                         prefix=f".{os.path.basename(output_path)}.") as out:
+            tmp_path = out.name
+            separator = b''
+            for line in content.split('\n'):
+                # Look for potential image injection points
+                potential_icons = ICON_PATTERN.findall(line)
+                inline_replacements = {}
+                above_lines = []
+                below_lines = []
                 
-                elif encoding == 'file':
-                    # Use relative file path
-                    relative_path = matching_image.relative_to(Path(md_file_path).parent)
-                    img_markdown = f"![{icon_name}]({relative_path})"
+                for match in potential_icons:
+                    icon_name = next((name for name in match if name), None)
+                    if not icon_name:
+                        continue
+                    
+                    # Try to find matching image
+                    matching_image = None
+                    
+                    if pattern_type == 'exact':
+                        if icon_name in available_images:
+                            matching_image = available_images[icon_name]
+                    
+                    elif pattern_type == 'contains':
+                        if icon_name not in contains_matches:
+                            contains_matches[icon_name] = find_contains_match(icon_name, contains_index)
+                        if contains_matches[icon_name] is not None:
+                            matching_image = image_paths[contains_matches[icon_name]]
+                    
+                    elif pattern_type == 'regex':
+                        for img_name, img_path in available_images.items():
+                            if re.search(icon_name, img_name, re.IGNORECASE):
+                                matching_image = img_path
+                                break
+                    
+                    if not matching_image:
+                        continue
+                    
+                    # Generate image markdown as parts; a Path part is streamed
+                    # as base64 when written instead of being built in memory
+                    if encoding == 'base64':
+                        if not os.access(matching_image, os.R_OK):
+                            print(f"Error encoding {matching_image}: file is not readable")
+                            continue
+                        img_parts = [f"![{icon_name}](", matching_image, ")"]
+                    else:  # file
+                        # Use relative file path
+                        relative_path = matching_image.relative_to(Path(md_file_path).parent)
+                        img_parts = [f"![{icon_name}]({relative_path})"]
                     
                     if position == 'inline':
-                        new_lines[-1] = line.replace(f"[{icon_name}]", img_markdown)
-                        new_lines[-1] = new_lines[-1].replace(f"{{{icon_name}}}", img_markdown)
-                        new_lines[-1] = new_lines[-1].replace(f"<{icon_name}>", img_markdown)
-                    else:
-                        if position == 'above':
-                            new_lines.insert(len(new_lines) - 1, img_markdown)
-                        else:  # below
-                            new_lines.append(img_markdown)
+                        # Replace the icon reference with inline image
+                        inline_replacements[icon_name] = img_parts
+                    elif position == 'above':
+                        above_lines.append(img_parts)
+                    else:  # below
+                        below_lines.append(img_parts)
+                    
+                    print(f"Injected image: {matching_image.name} for '{icon_name}'")
                 
-                print(f"Injected image: {matching_image.name} for '{icon_name}'")
-    
-    # Write output
-    output_path = output_file if output_file else md_file_path
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(new_lines))
+                if inline_replacements:
+                    line_parts = split_icon_references(line, inline_replacements)
+                else:
+                    line_parts = [line]
+                
+                for parts in above_lines + [line_parts] + below_lines:
+                    out.write(separator)
+                    write_parts(out, parts)
+                    separator = os.linesep.encode('ascii')
+        
+        # Keep the existing file's permissions; new files get the usual umask default
+        if os.path.exists(output_path):
+            shutil.copymode(output_path, tmp_path)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        
+        os.replace(tmp_path, output_path)
         print(f"Updated markdown saved to: {output_path}")
         return True
     except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
         print(f"Error writing output file: {e}")
         return False
 
@@ -7,12 +7,128 @@ Extracts images from PDF files using various methods.
 import os
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 import fitz  # PyMuPDF
 from PIL import Image
 import io
 
-def extract_images_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=300):
+def default_workers():
+    """Default worker count for PDF workers (more than 4 gives little extra speedup)."""
+    return min(os.cpu_count() or 1, 4)
+
+def chunk_pages(page_nums, num_workers, max_chunk=10):
+    """
+    Split pages into contiguous chunks of at most max_chunk pages, with at
+    least one chunk per worker, so each worker opens the PDF once per chunk.
+    """
+    num_chunks = max(min(num_workers, len(page_nums)), -(-len(page_nums) // max_chunk))
+    size, extra = divmod(len(page_nums), num_chunks) if page_nums else (0, 0)
+    chunks = []
+    start = 0
+    for i in range(num_chunks):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(page_nums[start:end])
+        start = end
+    return chunks
+
+def render_chunk(pdf_path, page_nums, dpi, output_dir, png_level=1, grayscale=False):
+    """
+    Render a chunk of PDF pages to PNG. Runs in a worker process.
+    
+    Returns:
+        list: Filenames of the saved images
+    """
+    # Each worker opens its own handle; fitz documents can't be shared across processes
+    pdf_document = fitz.open(pdf_path)
+    try:
+        # Create transformation matrix for desired DPI
+        mat = fitz.Matrix(dpi/72, dpi/72)
+        colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+        
+        filenames = []
+        for page_num in page_nums:
+            pix = pdf_document[page_num].get_pixmap(matrix=mat, colorspace=colorspace)
+            
+            # Save as PNG; low zlib levels encode much faster than MuPDF's default
+            image_filename = f"page_{page_num:03d}.png"
+            png_bytes = pix.pil_tobytes(format="PNG", optimize=False, compress_level=png_level)
+            with open(os.path.join(output_dir, image_filename), "wb") as image_file:
+                image_file.write(png_bytes)
+            filenames.append(image_filename)
+        return filenames
+    finally:
+        pdf_document.close()
+
+def extract_page_images(pdf_path, image_tasks, output_dir):
+    """
+    Extract and save the embedded images of a batch of pages. Runs in a worker process.
+    
+    Args:
+        image_tasks (list): (page_num, img_index, xref) tuples
+    
+    Returns:
+        list: Filenames of the saved images
+    """
+    pdf_document = fitz.open(pdf_path)
+    try:
+        filenames = []
+        for page_num, img_index, xref in image_tasks:
+            base_image = pdf_document.extract_image(xref)
+            image_bytes = base_image["image"]
+            
+            # Determine image format
+            image_ext = base_image["ext"]
+            if image_ext == "jpeg":
+                image_ext = "jpg"
+            
+            # Save image
+            image_filename = f"page_{page_num:03d}_img_{img_index:03d}.{image_ext}"
+            image_path = os.path.join(output_dir, image_filename)
+            
+            with open(image_path, "wb") as image_file:
+                image_file.write(image_bytes)
+            
+            filenames.append(image_filename)
+        return filenames
+    finally:
+        pdf_document.close()
+
+def collect_embedded_images(pdf_document):
+    """
+    Walk the pages and collect embedded image references. Images reused across
+    pages (logos, watermarks) share an xref and are only listed the first time.
+    
+    Returns:
+        list: One list of (page_num, img_index, xref) tuples per page with images
+    """
+    page_tasks = []
+    seen_xrefs = {}
+    for page_num in range(len(pdf_document)):
+        tasks = []
+        for img_index, img in enumerate(pdf_document[page_num].get_images()):
+            xref = img[0]
+            if xref in seen_xrefs:
+                print(f"Skipped duplicate: page_{page_num:03d}_img_{img_index:03d} "
+                      f"(same as {seen_xrefs[xref]})")
+                continue
+            seen_xrefs[xref] = f"page_{page_num:03d}_img_{img_index:03d}"
+            tasks.append((page_num, img_index, xref))
+        if tasks:
+            page_tasks.append(tasks)
+    return page_tasks
+
+def batch_image_tasks(page_tasks, num_workers):
+    """
+    Group per-page image tasks into contiguous batches (see chunk_pages) so each
+    worker opens the PDF once per batch rather than once per page.
+    """
+    return [[task for tasks in chunk for task in tasks]
+            for chunk in chunk_pages(page_tasks, num_workers)]
+
+def extract_images_from_pdf(pdf_path, output_dir, method='all', page_range=None, dpi=300,
+                            num_workers=None, png_level=1, grayscale=False):
     """
     Extract images from a PDF file.
     
@@ -22,6 +138,9 @@ def extract_images_from_pdf(pdf_path, output_dir, method='all', page_range=None,
         method (str): 'all' for all pages as images, 'embedded' for embedded images only
         page_range (tuple): (start_page, end_page) for specific pages (0-indexed)
         dpi (int): Resolution for page-to-image conversion
+        num_workers (int): Worker processes for rendering/extraction (default: min(CPU count, 4))
+        png_level (int): PNG compression level 0-9 for page images (1 = fast, 9 = smallest)
+        grayscale (bool): Render pages in grayscale (e.g. for OCR) instead of RGB
     """
     
     # Create output directory
@@ -32,31 +151,19 @@ def extract_images_from_pdf(pdf_path, output_dir, method='all', page_range=None,
         pdf_document = fitz.open(pdf_path)
         
         if method == 'embedded':
-            # Extract embedded images
+            # Collect image references per page (cheap metadata walk)
+            page_tasks = collect_embedded_images(pdf_document)
+            
+            # Extract and write images in parallel, one batch of pages per task
             image_count = 0
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]
-                    base_image = pdf_document.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    # Determine image format
-                    image_ext = base_image["ext"]
-                    if image_ext == "jpeg":
-                        image_ext = "jpg"
-                    
-                    # Save image
-                    image_filename = f"page_{page_num:03d}_img_{img_index:03d}.{image_ext}"
-                    image_path = os.path.join(output_dir, image_filename)
-                    
-                    with open(image_path, "wb") as image_file:
-                        image_file.write(image_bytes)
-                    
-                    image_count += 1
-                    print(f"Extracted: {image_filename}")
+            workers = num_workers or default_workers()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filenames in executor.map(extract_page_images, repeat(pdf_path),
+                                              batch_image_tasks(page_tasks, workers),
+                                              repeat(output_dir)):
+                    for image_filename in filenames:
+                        image_count += 1
+                        print(f"Extracted: {image_filename}")
             
             print(f"\nExtracted {image_count} embedded images")
             
@@ -64,22 +171,19 @@ def extract_images_from_pdf(pdf_path, output_dir, method='all', page_range=None,
             # Convert pages to images
             start_page = page_range[0] if page_range else 0
             end_page = page_range[1] if page_range else len(pdf_document)
+            page_nums = range(start_page, min(end_page, len(pdf_document)))
+            workers = num_workers or default_workers()
             
-            for page_num in range(start_page, min(end_page, len(pdf_document))):
-                page = pdf_document[page_num]
-                
-                # Create transformation matrix for desired DPI
-                mat = fitz.Matrix(dpi/72, dpi/72)
-                pix = page.get_pixmap(matrix=mat)
-                
-                # Save as PNG
-                image_filename = f"page_{page_num:03d}.png"
-                image_path = os.path.join(output_dir, image_filename)
-                pix.save(image_path)
-                
-                print(f"Extracted: {image_filename}")
+            # Render pages in parallel; each task opens the PDF once for a chunk of pages
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for filenames in executor.map(render_chunk, repeat(pdf_path),
+                                              chunk_pages(page_nums, workers), repeat(dpi),
+                                              repeat(output_dir), repeat(png_level),
+                                              repeat(grayscale)):
+                    for image_filename in filenames:
+                        print(f"Extracted: {image_filename}")
             
-            print(f"\nExtracted {end_page - start_page} pages as images")
+            print(f"\nExtracted {len(page_nums)} pages as images")
         
         pdf_document.close()
         
@@ -100,6 +204,12 @@ def main():
                        help='Page range to extract (0-indexed)')
     parser.add_argument('-d', '--dpi', type=int, default=300,
                        help='DPI for page-to-image conversion (default: 300)')
+    parser.add_argument('-w', '--workers', type=int,
+                       help='Worker processes for rendering/extraction (default: min(CPU count, 4))')
+    parser.add_argument('--png-level', type=int, choices=range(10), default=1, metavar='0-9',
+                       help='PNG compression level for page images (default: 1, fastest useful)')
+    parser.add_argument('--grayscale', action='store_true',
+                       help='Render pages in grayscale (smaller, e.g. for OCR)')
     
     args = parser.parse_args()
     
@@ -112,7 +222,10 @@ def main():
         args.output, 
         args.method, 
         args.pages, 
-        args.dpi
+        args.dpi,
+        args.workers,
+        args.png_level,
+        args.grayscale
     )
     
     if success: